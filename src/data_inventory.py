@@ -1,37 +1,118 @@
 import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 from pathlib import Path
 import librosa
-import soundfile as sf  # soundfile might be needed if librosa uses it under the hood or for specific formats
-from collections import Counter
+import soundfile as sf
+from collections import Counter, deque
+from itertools import chain
 from tqdm.auto import tqdm  # Use auto for notebook/console compatibility
 import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
 
 # Define common audio formats
 AUDIO_FORMATS = [".ogg", ".wav", ".mp3", ".flac", ".aiff", ".aif"]
+AUDIO_SUFFIXES = frozenset(AUDIO_FORMATS)  # O(1) membership for the hot filters
+FORMAT_CODES = {fmt: code for code, fmt in enumerate(AUDIO_FORMATS)}
+
+# Files handed to a pool worker at a time, how many batches per worker may be
+# queued ahead of the results, and how much of each file's head and tail to
+# ask the kernel to read ahead before parsing the headers
+METADATA_BATCH_SIZE = 64
+MAX_PENDING_BATCHES_PER_WORKER = 4
+HEADER_PREFETCH_BYTES = 64 * 1024
+
+# Saved per-file metadata (see perform_data_inventory(output_path=...)),
+# written in row groups of OUTPUT_ROW_GROUP_SIZE as results arrive
+OUTPUT_ROW_GROUP_SIZE = 10_000
+METADATA_OUTPUT_SCHEMA = pa.schema(
+    [
+        ("file_path", pa.string()),
+        ("duration", pa.float32()),
+        ("sampling_rate", pa.int32()),
+        ("format", pa.dictionary(pa.int8(), pa.string())),
+        ("error", pa.string()),
+        ("primary_label", pa.dictionary(pa.int32(), pa.string())),
+    ]
+)
 
 
 # --- Task 0.2.1: List all audio files ---
+def _scandir_audio(path, parent_name=None):
+    """Recursively yields (file_path, parent_dir_name) for audio files under `path`.
+
+    Uses os.scandir: DirEntry caches the file type from the directory listing,
+    so this avoids the extra stat calls that Path.rglob + is_file() make per
+    entry. The parent directory name (the species label) is passed down the
+    recursion, so it never has to be split back out of the path.
+
+    Directories that can't be listed (e.g. no read permission) are skipped,
+    as Path.rglob does, instead of aborting the whole walk.
+    """
+    if parent_name is None:
+        parent_name = os.path.basename(os.path.normpath(path))
+    try:
+        it = os.scandir(path)
+    except OSError as e:
+        print(f"Warning: Skipping unreadable directory {path}: {e}")
+        return
+    with it:
+        for entry in it:
+            # Like rglob: don't recurse into symlinked dirs, but do list
+            # symlinked files (is_file follows the link)
+            if entry.is_dir(follow_symlinks=False):
+                yield from _scandir_audio(entry.path, entry.name)
+            elif entry.is_file():
+                # Lower-case only the extension, not the whole name
+                name = entry.name
+                i = name.rfind(".")
+                if i > 0 and name[i:].lower() in AUDIO_SUFFIXES:
+                    yield entry.path, parent_name
+
+
 def list_audio_files(train_audio_path):
     """Lists all audio files recursively within the training directory."""
-    audio_files = []
-    path_obj = Path(train_audio_path)
-    for item in path_obj.rglob("*"):
-        if item.is_file() and item.suffix.lower() in AUDIO_FORMATS:
-            audio_files.append(str(item))
-    return audio_files
+    return [file_path for file_path, _ in _scandir_audio(train_audio_path)]
+
+
+# --- Taxonomy lookup (shared by Tasks 0.2.2 and 0.2.4) ---
+def _index_taxonomy(taxonomy_df):
+    """Returns taxonomy indexed by primary_label, limited to the columns we merge.
+
+    Already-indexed frames are returned unchanged so the lookup can be built
+    once and passed to several steps.
+    """
+    if taxonomy_df.index.name == "primary_label":
+        return taxonomy_df
+
+    # Select only the columns that exist in the actual taxonomy.csv
+    cols_to_merge = ["class_name"]
+    missing_cols = [col for col in cols_to_merge if col not in taxonomy_df.columns]
+    if missing_cols:
+        print(f"Warning: Columns {missing_cols} not found in taxonomy_df. Merging with available columns.")
+        cols_to_merge = [col for col in cols_to_merge if col in taxonomy_df.columns]
+
+    return taxonomy_df.set_index("primary_label")[cols_to_merge]
 
 
 # --- Task 0.2.2: Count files per group ---
-def count_files_per_group(audio_files, taxonomy_df):
-    """Counts files per species and taxonomic group (class)."""
-    species_labels = [Path(f).parent.name for f in audio_files]
+def count_files_per_group(audio_files, taxonomy_df, species_labels=None):
+    """Counts files per species and taxonomic group (class).
+
+    `taxonomy_df` may be the raw taxonomy table or the output of
+    `_index_taxonomy`. `species_labels`, if given, are the per-file labels
+    already known from the directory walk and are used instead of the paths.
+    """
+    # Species label is the parent directory name. Counting straight from a
+    # generator keeps memory at O(unique species) and needs no Path objects.
+    if species_labels is None:
+        species_labels = (os.path.basename(os.path.dirname(f)) for f in audio_files)
     species_counts = Counter(species_labels)
 
     # Map species to class using taxonomy
-    species_to_class = taxonomy_df.set_index("primary_label")[
-        "class_name"
-    ].to_dict()  # Use 'class_name'
+    species_to_class = _index_taxonomy(taxonomy_df)["class_name"]
 
     group_counts = Counter()
     for species, count in species_counts.items():
@@ -44,95 +125,397 @@ def count_files_per_group(audio_files, taxonomy_df):
 
 
 # --- Task 0.2.3: Extract file metadata ---
-def extract_file_metadata(file_path):
-    """Extracts duration, sampling rate, and format for a single audio file."""
-    metadata = {
-        "file_path": file_path,
-        "duration": None,
-        "sampling_rate": None,
-        "format": Path(file_path).suffix.lower(),
-        "error": None,
-    }
-    if metadata["format"] not in AUDIO_FORMATS:
-        metadata["error"] = f"Non-audio extension: {metadata['format']}"
-        return metadata
+METADATA_FIELDS = ("file_path", "duration", "sampling_rate", "format", "error")
+
+
+def _read_file_metadata(file_path):
+    """Returns (file_path, duration, sampling_rate, format, error) for one file.
+
+    Tuple form of `extract_file_metadata`; this is what pool workers send back
+    so the driver can fill column arrays instead of collecting dicts.
+    """
+    fmt = os.path.splitext(file_path)[1].lower()
+    if fmt not in AUDIO_SUFFIXES:
+        return file_path, None, None, fmt, f"Non-audio extension: {fmt}"
 
     try:
-        # Use soundfile first for potentially better format support and speed
-        # It might fail for some formats librosa handles, hence the fallback
+        # Only the container header is needed for duration and sampling rate,
+        # so avoid decoding the samples. soundfile.info parses the header.
         try:
-            with sf.SoundFile(file_path) as f:
-                metadata["duration"] = f.frames / f.samplerate
-                metadata["sampling_rate"] = f.samplerate
+            info = sf.info(file_path)
+            return file_path, info.duration, info.samplerate, fmt, None
         except Exception as sf_err:
-            # Fallback to librosa if soundfile fails
-            y, sr = librosa.load(
-                file_path, sr=None, mono=False
-            )  # Load with original sr
-            metadata["sampling_rate"] = sr
-            metadata["duration"] = librosa.get_duration(y=y, sr=sr)
+            # Fallback to librosa (audioread) for formats soundfile can't read,
+            # e.g. some mp3s. get_duration(path=...) still avoids a full load.
+            duration = librosa.get_duration(path=file_path)
+            sampling_rate = librosa.get_samplerate(file_path)
+            return file_path, duration, sampling_rate, fmt, None
 
     except Exception as e:
-        metadata["error"] = f"Error loading/processing file: {str(e)}"
+        return file_path, None, None, fmt, f"Error loading/processing file: {str(e)}"
 
-    return metadata
 
+def extract_file_metadata(file_path):
+    """Extracts duration, sampling rate, and format for a single audio file."""
+    return dict(zip(METADATA_FIELDS, _read_file_metadata(file_path)))
 
-# --- Task 0.2.4: Create metadata DataFrame ---
-def create_metadata_dataframe(metadata_list, taxonomy_df):
-    """Creates a pandas DataFrame from the extracted metadata list and merges taxonomy info."""
-    metadata_df = pd.DataFrame(metadata_list)
 
-    # Extract primary_label from file_path (assuming parent directory is the label)
-    metadata_df["primary_label"] = metadata_df["file_path"].apply(
-        lambda x: Path(x).parent.name
-    )
+def _prefetch_headers(paths):
+    """Asks the kernel to start reading the head and tail of each file.
 
-    # Merge with taxonomy information
-    # Select only the columns that exist in the actual taxonomy.csv
-    cols_to_merge = ['primary_label', 'class_name']
-    missing_cols = [col for col in cols_to_merge if col not in taxonomy_df.columns]
+    posix_fadvise(WILLNEED) queues asynchronous readahead, so the reads for a
+    whole batch are in flight at once and the header parses that follow hit
+    the page cache. The tail is included because Ogg duration comes from the
+    last page. No-op where posix_fadvise is unavailable (e.g. Windows, macOS).
+    """
+    if not hasattr(os, "posix_fadvise"):
+        return
+    for path in paths:
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except OSError:
+            continue  # Reported properly when the header is read
+        try:
+            size = os.fstat(fd).st_size
+            os.posix_fadvise(fd, 0, HEADER_PREFETCH_BYTES, os.POSIX_FADV_WILLNEED)
+            if size > HEADER_PREFETCH_BYTES:
+                os.posix_fadvise(
+                    fd,
+                    size - HEADER_PREFETCH_BYTES,
+                    HEADER_PREFETCH_BYTES,
+                    os.POSIX_FADV_WILLNEED,
+                )
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+
+def _read_metadata_batch(indices, paths, prefetch_headers=False):
+    """Pool worker: reads each file's metadata, optionally prefetching headers first.
+
+    `prefetch_headers` enables `_prefetch_headers` for the batch. It is off by
+    default: it costs an extra open/fstat/fadvise per file and only pays off
+    on storage where readahead hides real seek latency (cold HDD/network).
+
+    Returns compact (index, duration, sampling_rate, format_code, error)
+    records of plain Python scalars, which pickle smaller and faster than
+    numpy ones: duration (NaN if unknown), sampling rate (-1 if unknown) and
+    the format as an index into AUDIO_FORMATS.
+    """
+    if prefetch_headers:
+        _prefetch_headers(paths)
+    records = []
+    for i, path in zip(indices, paths):
+        _, duration, sr, fmt, err = _read_file_metadata(path)
+        records.append(
+            (
+                i,
+                float("nan") if duration is None else float(duration),
+                -1 if sr is None else int(sr),
+                FORMAT_CODES.get(fmt, -1),
+                err,
+            )
+        )
+    return records
+
+
+def _file_signature(path):
+    """(mtime_ns, size) used to tell whether a cached metadata row is stale."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return -1, -1  # Never matches a cached row; the read reports the error
+    return st.st_mtime_ns, st.st_size
+
+
+def _load_metadata_cache(cache_path):
+    """Loads the per-file metadata cache, indexed by file_path, or None if absent/unreadable."""
+    if not os.path.exists(cache_path):
+        return None
+    try:
+        cached = pd.read_parquet(cache_path)
+    except Exception as e:
+        print(f"Warning: Ignoring unreadable metadata cache {cache_path}: {e}")
+        return None
+    missing_cols = {*METADATA_FIELDS, "mtime_ns", "size"} - set(cached.columns)
     if missing_cols:
-        print(f"Warning: Columns {missing_cols} not found in taxonomy_df. Merging with available columns.")
-        cols_to_merge = [col for col in cols_to_merge if col in taxonomy_df.columns]
+        print(f"Warning: Ignoring metadata cache {cache_path} missing {sorted(missing_cols)}")
+        return None
+    return cached.set_index("file_path")
+
+
+def _save_metadata_cache(cache_path, columns, signatures):
+    """Writes the successfully read rows to the metadata cache.
+
+    Failures (e.g. a read-only dataset directory) only print a warning; the
+    extracted metadata is still returned to the caller.
+    """
+    cache_df = pd.DataFrame(columns, copy=False)
+    signatures = np.array(signatures, dtype=np.int64).reshape(len(cache_df), 2)
+    cache_df["mtime_ns"] = signatures[:, 0]
+    cache_df["size"] = signatures[:, 1]
+    cache_df = cache_df[cache_df["error"].isna()]  # Errors are retried next run
+    try:
+        cache_df.to_parquet(cache_path, index=False, compression="zstd")
+    except OSError as e:
+        print(f"Warning: Could not write metadata cache {cache_path}: {e}")
+
+
+def _metadata_record_batch(
+    file_paths, durations, sampling_rates, format_codes, errors, species_labels
+):
+    """Builds a pyarrow RecordBatch (METADATA_OUTPUT_SCHEMA) from column slices."""
+    return pa.RecordBatch.from_arrays(
+        [
+            pa.array(file_paths, pa.string()),
+            pa.array(durations, pa.float32(), mask=np.isnan(durations)),
+            pa.array(sampling_rates, pa.int32(), mask=sampling_rates < 0),
+            pa.DictionaryArray.from_arrays(
+                pa.array(format_codes, pa.int8(), mask=format_codes < 0),
+                pa.array(AUDIO_FORMATS, pa.string()),
+            ),
+            pa.array(errors, pa.string()),
+            pa.array(species_labels, pa.string()).dictionary_encode(),
+        ],
+        schema=METADATA_OUTPUT_SCHEMA,
+    )
+
+
+def _progress_disabled():
+    """True for non-interactive runs (output piped or logged), where progress bars are noise.
+
+    Notebooks don't have a TTY either but render tqdm.auto's widget, so keep it there.
+    """
+    return not sys.stderr.isatty() and "ipykernel" not in sys.modules
+
+
+def _reusable_cache_rows(cached):
+    """Maps (path, mtime_ns, size) to the row of each reusable cache entry."""
+    if cached is None:
+        return {}
+    # Rows with an error (e.g. a transient failure or a missing decoder
+    # backend) are never reused, so those files are retried
+    cache_keys = zip(cached.index, cached["mtime_ns"], cached["size"])
+    cache_ok = cached["error"].isna().to_numpy()
+    return {key: row for row, key in enumerate(cache_keys) if cache_ok[row]}
+
+
+def _fill_from_cache(cached, hits, durations, sampling_rates, format_codes, errors):
+    """Copies the cached metadata of each (file index, cache row) hit into the columns."""
+    hit_idx = np.array([i for i, _ in hits], dtype=np.intp)
+    hit_rows = np.array([row for _, row in hits], dtype=np.intp)
+    cached_durations = cached["duration"].to_numpy(dtype=np.float32)
+    cached_rates = cached["sampling_rate"].fillna(-1).to_numpy(dtype=np.int32)
+    cached_codes = pd.Categorical(cached["format"], AUDIO_FORMATS).codes
+    cached_errors = cached["error"].to_numpy()
+    durations[hit_idx] = cached_durations[hit_rows]
+    sampling_rates[hit_idx] = cached_rates[hit_rows]
+    format_codes[hit_idx] = cached_codes[hit_rows]
+    for i, row in hits:
+        errors[i] = cached_errors[row]
+
+
+def _write_row_groups(writer, rows, start, stop):
+    """Writes rows [start, stop) of the `_metadata_record_batch` columns in `rows`."""
+    for group_start in range(start, stop, OUTPUT_ROW_GROUP_SIZE):
+        group_stop = min(group_start + OUTPUT_ROW_GROUP_SIZE, stop)
+        writer.write_batch(
+            _metadata_record_batch(*(col[group_start:group_stop] for col in rows))
+        )
+
+
+def _collect_metadata(
+    audio_entries, workers=None, cache_path=None, output_path=None, prefetch_headers=False
+):
+    """Extracts metadata for (file_path, label) pairs in a process pool, as a dict of columns.
+
+    Batches are submitted while the walk runs. `cache_path` reuses unchanged
+    rows from a parquet cache; `output_path` streams rows to parquet in order.
+    """
+    cached = _load_metadata_cache(cache_path) if cache_path is not None else None
+    cache_rows = _reusable_cache_rows(cached)
+
+    file_paths = []
+    species_labels = []
+    signatures = []
+    hits = []  # (file index, cache row) pairs
+    pending = deque()  # Submitted batches, oldest first
+    done = []  # Batches already collected during the walk
+    batch_indices, batch_paths = [], []
+    workers = workers or os.cpu_count()
+    writer = None
+
+    ex = ProcessPoolExecutor(max_workers=workers)
+    try:
+        # Walk and dispatch: workers start on the first batch while the walk
+        # is still running
+        for i, (path, label) in enumerate(audio_entries):
+            file_paths.append(path)
+            species_labels.append(label)
+            if cache_path is not None:
+                signature = _file_signature(path)
+                signatures.append(signature)
+                row = cache_rows.get((path, *signature))
+                if row is not None:
+                    hits.append((i, row))
+                    continue
+            batch_indices.append(i)
+            batch_paths.append(path)
+            if len(batch_paths) == METADATA_BATCH_SIZE:
+                pending.append(
+                    ex.submit(
+                        _read_metadata_batch, batch_indices, batch_paths, prefetch_headers
+                    )
+                )
+                batch_indices, batch_paths = [], []
+                if len(pending) > MAX_PENDING_BATCHES_PER_WORKER * workers:
+                    # Keep the walk only a few batches ahead of the workers
+                    done.append(pending.popleft().result())
+        if batch_paths:
+            pending.append(
+                ex.submit(_read_metadata_batch, batch_indices, batch_paths, prefetch_headers)
+            )
+
+        n = len(file_paths)
+        durations = np.empty(n, dtype=np.float32)
+        sampling_rates = np.empty(n, dtype=np.int32)
+        format_codes = np.empty(n, dtype=np.int8)
+        errors = [None] * n
+        rows = (file_paths, durations, sampling_rates, format_codes, errors, species_labels)
+
+        if cached is not None:
+            _fill_from_cache(cached, hits, durations, sampling_rates, format_codes, errors)
+            print(f"Metadata cache: {len(hits)} hits, {n - len(hits)} files to read.")
+
+        if output_path is not None:
+            writer = pq.ParquetWriter(output_path, METADATA_OUTPUT_SCHEMA, compression="zstd")
+        written = 0  # Rows [0, written) are already in the output file
+
+        if done or pending:
+            # One progress update per worker batch rather than per file
+            with tqdm(
+                total=n - len(hits), mininterval=0.5, disable=_progress_disabled()
+            ) as pbar:
+                for batch in chain(done, (future.result() for future in pending)):
+                    for i, duration, sr, fmt_code, err in batch:
+                        durations[i] = duration
+                        sampling_rates[i] = sr
+                        format_codes[i] = fmt_code
+                        errors[i] = err
+                    if writer is not None:
+                        # Rows below i + 1 are filled (cache hits up front,
+                        # misses in order); only whole row groups until the
+                        # final flush
+                        ready = (i + 1 - written) // OUTPUT_ROW_GROUP_SIZE
+                        stop = written + ready * OUTPUT_ROW_GROUP_SIZE
+                        _write_row_groups(writer, rows, written, stop)
+                        written = stop
+                    pbar.update(len(batch))
+
+        if writer is not None:
+            _write_row_groups(writer, rows, written, n)
+    except BaseException:
+        # Drop the queued batches so the error surfaces now, not after they run
+        ex.shutdown(cancel_futures=True)
+        raise
+    finally:
+        ex.shutdown()
+        if writer is not None:
+            writer.close()
+
+    columns = {
+        "file_path": file_paths,
+        "duration": durations,
+        "sampling_rate": pd.arrays.IntegerArray(sampling_rates, sampling_rates < 0),
+        "format": pd.Categorical.from_codes(format_codes, AUDIO_FORMATS),
+        "error": errors,
+    }
+
+    if cache_path is not None and n > 0:  # An empty walk must not wipe the cache
+        _save_metadata_cache(cache_path, columns, signatures)
+
+    columns["primary_label"] = species_labels
+    return columns
 
-    metadata_df = pd.merge(
-        metadata_df,
-        taxonomy_df[cols_to_merge],
+
+# --- Task 0.2.4: Create metadata DataFrame ---
+def create_metadata_dataframe(metadata_list, taxonomy_df):
+    """Creates a pandas DataFrame from the extracted metadata list and merges taxonomy info.
+
+    `metadata_list` may be a list of per-file dicts or a dict of columns (as
+    returned by `_collect_metadata`). Like `count_files_per_group`, accepts a
+    raw or pre-indexed taxonomy.
+    """
+    metadata_df = pd.DataFrame(metadata_list, copy=False)
+
+    # Extract primary_label from file_path (assuming parent directory is the
+    # label), unless the directory walk already supplied it
+    if "primary_label" not in metadata_df.columns:
+        metadata_df["primary_label"] = [
+            os.path.basename(os.path.dirname(p)) for p in metadata_df["file_path"]
+        ]
+
+    # Join taxonomy information on the pre-indexed lookup
+    metadata_df = metadata_df.join(
+        _index_taxonomy(taxonomy_df),
         on="primary_label",
         how="left",  # Keep all files even if species not in taxonomy
     )
+
+    # Low-cardinality labels as categoricals: counts in the summary run on
+    # integer codes and the columns take far less memory than object strings
+    for col in ("primary_label", "format", "class_name"):
+        if col in metadata_df.columns:
+            metadata_df[col] = metadata_df[col].astype("category")
     return metadata_df
 
 
 # --- Task 0.2.5: Generate summary statistics ---
+def _count_values(series):
+    """value_counts that also drops unobserved categories of categorical columns."""
+    counts = series.value_counts(sort=False)
+    return counts[counts > 0]
+
+
 def generate_summary_statistics(metadata_df):
     """Generates a dictionary of summary statistics from the metadata DataFrame."""
     summary = {}
 
+    # One value_counts per label column gives both the distinct count and the
+    # per-value counts, instead of separate nunique and value_counts scans
+    species_counts = _count_values(metadata_df["primary_label"])
+    group_counts = _count_values(metadata_df["class_name"])
+
     summary["total_files"] = len(metadata_df)
-    summary["total_species"] = metadata_df["primary_label"].nunique()
-    summary["total_taxonomic_groups"] = metadata_df["class_name"].nunique()
+    summary["total_species"] = len(species_counts)
+    summary["total_taxonomic_groups"] = len(group_counts)
 
-    summary["files_per_species"] = metadata_df["primary_label"].value_counts().to_dict()
-    summary["files_per_group"] = metadata_df["class_name"].value_counts().to_dict()
+    summary["files_per_species"] = species_counts.to_dict()
+    summary["files_per_group"] = group_counts.to_dict()
 
     # Duration stats (handle potential NaNs)
     valid_durations = metadata_df["duration"].dropna()
+    duration_stats = valid_durations.agg(["mean", "median", "min", "max", "std", "sum"])
     summary["duration_stats"] = {
-        "mean": valid_durations.mean(),
-        "median": valid_durations.median(),
-        "min": valid_durations.min(),
-        "max": valid_durations.max(),
-        "std": valid_durations.std(),
-        "total_hours": valid_durations.sum() / 3600,
+        "mean": duration_stats["mean"],
+        "median": duration_stats["median"],
+        "min": duration_stats["min"],
+        "max": duration_stats["max"],
+        "std": duration_stats["std"],
+        "total_hours": duration_stats["sum"] / 3600,
     }
 
-    # Sampling rate and format counts (handle potential NaNs)
-    summary["sampling_rate_stats"] = (
-        metadata_df["sampling_rate"].dropna().value_counts().to_dict()
+    # Sampling rate and format counts (handle potential NaNs). There are only a
+    # handful of distinct rates, so count them with one np.unique over int32
+    sampling_rates = metadata_df["sampling_rate"].to_numpy(
+        dtype=np.float64, na_value=np.nan
     )
-    summary["format_counts"] = metadata_df["format"].value_counts().to_dict()
+    rates, rate_counts = np.unique(
+        sampling_rates[~np.isnan(sampling_rates)].astype(np.int32), return_counts=True
+    )
+    summary["sampling_rate_stats"] = dict(zip(rates.tolist(), rate_counts.tolist()))
+    summary["format_counts"] = _count_values(metadata_df["format"]).to_dict()
 
     # Error count
     summary["error_count"] = metadata_df["error"].notna().sum()
@@ -141,14 +524,40 @@ def generate_summary_statistics(metadata_df):
 
 
 # --- Main Execution Logic (Optional: for running as a script) ---
-def perform_data_inventory(data_dir):
-    """Performs all data inventory tasks sequentially."""
+INVENTORY_STAGES = ("count", "metadata", "summary")
+
+
+def perform_data_inventory(
+    data_dir,
+    workers=None,
+    cache_path=None,
+    stages=INVENTORY_STAGES,
+    output_path=None,
+    prefetch_headers=False,
+):
+    """Performs the requested data inventory tasks sequentially.
+
+    Audio files are always listed; `stages` picks the later steps ("count",
+    "metadata" and "summary", which needs "metadata"). The other options are
+    passed to `_collect_metadata`. Returns a dict of results, or None if the
+    data is missing.
+    """
+    unknown_stages = set(stages) - set(INVENTORY_STAGES)
+    if unknown_stages:
+        raise ValueError(
+            f"Unknown stages {sorted(unknown_stages)}; expected a subset of {INVENTORY_STAGES}"
+        )
+    if "summary" in stages and "metadata" not in stages:
+        raise ValueError('The "summary" stage requires the "metadata" stage.')
+
+    # Path only at this boundary; the walk and per-file steps work on plain
+    # strings via os.path
     data_dir = Path(data_dir)
-    train_audio_path = data_dir / "train_audio"
-    taxonomy_path = data_dir / "taxonomy.csv"
+    train_audio_path = os.fspath(data_dir / "train_audio")
+    taxonomy_path = os.fspath(data_dir / "taxonomy.csv")
 
     print("Verifying data access...")
-    if not train_audio_path.exists() or not taxonomy_path.exists():
+    if not os.path.isdir(train_audio_path) or not os.path.isfile(taxonomy_path):
         print(f"Error: Required data not found in {data_dir}")
         return None
     print("Data access verified.")
@@ -156,46 +565,72 @@ def perform_data_inventory(data_dir):
     print("Loading taxonomy...")
     taxonomy_df = pd.read_csv(taxonomy_path)
     print(f"Taxonomy loaded: {len(taxonomy_df)} species.")
-
-    print("Listing audio files...")
-    audio_files = list_audio_files(train_audio_path)
+    taxonomy_idx = _index_taxonomy(taxonomy_df)
+
+    # Every other stage works from the file list, so listing always runs. When
+    # metadata is requested the walk feeds the extraction pool directly.
+    if "metadata" in stages:
+        print("Listing audio files and extracting metadata (this may take a while)...")
+        metadata_list = _collect_metadata(
+            _scandir_audio(train_audio_path),
+            workers,
+            cache_path,
+            output_path,
+            prefetch_headers,
+        )
+        audio_files = metadata_list["file_path"]
+        species_labels = metadata_list["primary_label"]
+    else:
+        print("Listing audio files...")
+        audio_entries = list(_scandir_audio(train_audio_path))
+        audio_files = [file_path for file_path, _ in audio_entries]
+        species_labels = [label for _, label in audio_entries]
     if not audio_files:
         print("Error: No audio files found.")
         return None
     print(f"Found {len(audio_files)} audio files.")
+    results = {"audio_files": audio_files}
 
-    print("Counting files per group...")
-    species_counts, group_counts = count_files_per_group(audio_files, taxonomy_df)
-    print("Counts calculated.")
-
-    print("Extracting metadata (this may take a while)...")
-    metadata_list = [extract_file_metadata(f) for f in tqdm(audio_files)]
-    print("Metadata extraction complete.")
-
-    print("Creating metadata DataFrame...")
-    metadata_df = create_metadata_dataframe(metadata_list, taxonomy_df)
-    print("DataFrame created.")
-
-    print("Generating summary statistics...")
-    summary_stats = generate_summary_statistics(metadata_df)
-    print("Summary statistics generated.")
-
-    # Optionally save or return results
-    # metadata_df.to_csv(data_dir / "metadata_inventory.csv", index=False)
+    if "count" in stages:
+        print("Counting files per group...")
+        species_counts, group_counts = count_files_per_group(
+            audio_files, taxonomy_idx, species_labels
+        )
+        results["species_counts"] = species_counts
+        results["group_counts"] = group_counts
+        print("Counts calculated.")
+
+    if "metadata" in stages:
+        print("Creating metadata DataFrame...")
+        metadata_df = create_metadata_dataframe(metadata_list, taxonomy_idx)
+        results["metadata_df"] = metadata_df
+        print("DataFrame created.")
+
+    if "summary" in stages:
+        print("Generating summary statistics...")
+        results["summary_stats"] = generate_summary_statistics(metadata_df)
+        print("Summary statistics generated.")
+
+    # Optionally save or return results (metadata is saved during extraction
+    # to output_path)
     # with open(data_dir / "summary_statistics.json", 'w') as f:
     #     import json
     #     json.dump(summary_stats, f, indent=4)
 
-    return metadata_df, summary_stats
+    return results
 
 
 if __name__ == "__main__":
     # Example usage when run as a script
     # Assumes the script is run from a directory where './data' exists
     DEFAULT_DATA_DIR = "../data"  # Adjust if your structure is different
-    metadata_df, summary_stats = perform_data_inventory(DEFAULT_DATA_DIR)
+    # Saved to the working directory, not into the (often read-only) dataset
+    results = perform_data_inventory(
+        DEFAULT_DATA_DIR, output_path="metadata_inventory.parquet"
+    )
 
-    if metadata_df is not None and summary_stats is not None:
+    if results is not None:
+        summary_stats = results["summary_stats"]
         print("\n--- Data Inventory Summary ---")
         print(f"Total Files: {summary_stats['total_files']}")
         print(f"Total Species: {summary_stats['total_species']}")
@@ -1,14 +1,25 @@
 import pytest
 import pandas as pd
+import numpy as np
+import soundfile as sf
+import pyarrow.parquet as pq
 import os
+import time
 from pathlib import Path
 from unittest.mock import MagicMock # Import MagicMock
+from concurrent.futures import ThreadPoolExecutor
+import data_inventory
 from data_inventory import (
     list_audio_files,
     count_files_per_group,
     extract_file_metadata,
     create_metadata_dataframe,
-    generate_summary_statistics
+    generate_summary_statistics,
+    _index_taxonomy,
+    _collect_metadata,
+    _prefetch_headers,
+    _read_metadata_batch,
+    perform_data_inventory
 )
 
 # Define a fixture for a temporary data directory structure
@@ -68,6 +79,42 @@ def test_list_audio_files(temp_data_dir):
     assert found_files == expected_files
     assert str(train_audio_path / "bird1" / "not_audio.txt") not in found_files
 
+def test_list_audio_files_skips_unreadable_dir(temp_data_dir, mocker):
+    # A directory whose listing fails is skipped, the rest is still listed
+    train_audio_path = temp_data_dir / "train_audio"
+    unreadable = str(train_audio_path / "bird1")
+    real_scandir = os.scandir
+
+    def scandir(path):
+        if os.fspath(path) == unreadable:
+            raise PermissionError(13, "Permission denied", unreadable)
+        return real_scandir(path)
+
+    mocker.patch('os.scandir', side_effect=scandir)
+
+    found_files = sorted(list_audio_files(str(train_audio_path)))
+    assert found_files == sorted([
+        str(train_audio_path / "bird2" / "file3.ogg"),
+        str(train_audio_path / "frog1" / "file4.ogg"),
+        str(train_audio_path / "insect1" / "file5.ogg"),
+    ])
+
+def test_list_audio_files_symlinks(tmp_path):
+    # Symlinked files are listed (as with rglob); symlinked dirs are not walked
+    train_audio_path = tmp_path / "train_audio"
+    (train_audio_path / "bird1").mkdir(parents=True)
+    target = tmp_path / "elsewhere.wav"
+    target.touch()
+    (train_audio_path / "bird1" / "link.wav").symlink_to(target)
+    (train_audio_path / "bird1" / "real.wav").touch()
+    (train_audio_path / "linked_dir").symlink_to(train_audio_path / "bird1", target_is_directory=True)
+
+    found_files = sorted(list_audio_files(str(train_audio_path)))
+    assert found_files == sorted([
+        str(train_audio_path / "bird1" / "link.wav"),
+        str(train_audio_path / "bird1" / "real.wav"),
+    ])
+
 # ---- Test Task 0.2.2: Count files per group ----
 def test_count_files_per_group(temp_data_dir):
     train_audio_path = temp_data_dir / "train_audio"
@@ -88,19 +135,18 @@ def test_count_files_per_group(temp_data_dir):
 # as we don't have real audio files with metadata.
 #@pytest.mark.skip(reason="Requires mocking audio library like librosa")
 def test_extract_file_metadata(temp_data_dir, mocker):
-    # Mock soundfile.SoundFile to simulate reading file attributes
-    mock_sf_file = MagicMock()
-    mock_sf_file.frames = 336000 # Example frames
-    mock_sf_file.samplerate = 32000 # Example samplerate
-    # duration = frames / samplerate = 336000 / 32000 = 10.5
-    mock_sf_context = MagicMock(__enter__=MagicMock(return_value=mock_sf_file))
+    # Mock soundfile.info to simulate reading the file header
+    mock_sf_info = MagicMock()
+    mock_sf_info.duration = 10.5 # Example duration
+    mock_sf_info.samplerate = 32000 # Example samplerate
 
-    # Patch the soundfile.SoundFile context manager
-    mocker.patch('soundfile.SoundFile', return_value=mock_sf_context)
+    # Patch soundfile.info
+    mocker.patch('soundfile.info', return_value=mock_sf_info)
 
     # We don't expect librosa to be called if soundfile succeeds
     mock_librosa_load = mocker.patch('librosa.load', side_effect=AssertionError("Librosa should not be called"))
     mock_librosa_duration = mocker.patch('librosa.get_duration', side_effect=AssertionError("Librosa should not be called"))
+    mock_librosa_samplerate = mocker.patch('librosa.get_samplerate', side_effect=AssertionError("Librosa should not be called"))
 
     file_path = str(temp_data_dir / "train_audio" / "bird1" / "file1.ogg")
     metadata = extract_file_metadata(file_path)
@@ -116,7 +162,8 @@ def test_extract_file_metadata_error(temp_data_dir, mocker):
      # Mock librosa.load to raise an exception
     mocker.patch('librosa.load', side_effect=Exception("Failed to load"))
     mocker.patch('librosa.get_duration', side_effect=Exception("Failed to load")) # Mock duration too
-    mocker.patch('soundfile.SoundFile', side_effect=Exception("Failed to load")) # Also mock soundfile
+    mocker.patch('librosa.get_samplerate', side_effect=Exception("Failed to load"))
+    mocker.patch('soundfile.info', side_effect=Exception("Failed to load")) # Also mock soundfile
 
     # Use a file known to exist but cause error in mock
     file_path = str(temp_data_dir / "train_audio" / "bird1" / "file1.ogg")
@@ -142,6 +189,165 @@ def test_extract_file_metadata_non_audio(temp_data_dir):
     assert metadata['error'] is not None or (metadata['duration'] is None and metadata['sampling_rate'] is None)
 
 
+@pytest.fixture
+def species_dir(tmp_path):
+    # One species folder with a real (silent) 1 s wav, so headers can be read
+    species_dir = tmp_path / "train_audio" / "bird1"
+    species_dir.mkdir(parents=True)
+    sf.write(str(species_dir / "a.wav"), np.zeros(16000), 16000)
+    return species_dir
+
+def test_collect_metadata_cache(tmp_path, species_dir, mocker):
+    wav_path = str(species_dir / "a.wav")
+    cache_path = tmp_path / ".meta_cache.parquet"
+
+    first = _collect_metadata([(wav_path, 'bird1')], workers=1, cache_path=cache_path)
+    assert cache_path.exists()
+    assert first['duration'][0] == pytest.approx(1.0)
+
+    # Unchanged file: served from the cache, no worker batches dispatched
+    mocker.patch('data_inventory._read_metadata_batch', side_effect=AssertionError("Should hit the cache"))
+    second = _collect_metadata([(wav_path, 'bird1')], workers=1, cache_path=cache_path)
+    assert second['duration'][0] == pytest.approx(1.0)
+    assert second['sampling_rate'][0] == 16000
+    assert second['format'][0] == '.wav'
+    assert second['error'][0] is None
+
+def test_collect_metadata_cache_changed_file(tmp_path, species_dir):
+    wav_path = str(species_dir / "a.wav")
+    cache_path = tmp_path / ".meta_cache.parquet"
+    _collect_metadata([(wav_path, 'bird1')], workers=1, cache_path=cache_path)
+
+    # Same size (16000 frames) but a newer mtime: read again, not served stale
+    stat = os.stat(wav_path)
+    sf.write(wav_path, np.zeros(16000), 8000)
+    assert os.path.getsize(wav_path) == stat.st_size
+    os.utime(wav_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    columns = _collect_metadata([(wav_path, 'bird1')], workers=1, cache_path=cache_path)
+    assert columns['duration'][0] == pytest.approx(2.0)
+    assert columns['sampling_rate'][0] == 8000
+
+    # Different size with the mtime put back: also read again
+    stat = os.stat(wav_path)
+    sf.write(wav_path, np.zeros(24000), 8000)
+    os.utime(wav_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    columns = _collect_metadata([(wav_path, 'bird1')], workers=1, cache_path=cache_path)
+    assert columns['duration'][0] == pytest.approx(3.0)
+
+def test_collect_metadata_cache_skips_errors_and_empty_runs(tmp_path, species_dir):
+    wav_path = str(species_dir / "a.wav")
+    broken_path = str(species_dir / "broken.ogg")
+    with open(broken_path, 'wb') as f:
+        f.write(b'OggS') # Unreadable: extraction records an error
+    cache_path = tmp_path / ".meta_cache.parquet"
+
+    columns = _collect_metadata([(wav_path, 'bird1'), (broken_path, 'bird1')], workers=1, cache_path=cache_path)
+    assert columns['error'][1] is not None
+
+    # Error rows are not cached, so the broken file is retried next run
+    cached = pd.read_parquet(cache_path)
+    assert cached['file_path'].tolist() == [wav_path]
+
+    # A walk that finds nothing leaves the existing cache alone
+    _collect_metadata([], workers=1, cache_path=cache_path)
+    assert pd.read_parquet(cache_path)['file_path'].tolist() == [wav_path]
+
+def test_collect_metadata_unwritable_cache(tmp_path, species_dir, capsys):
+    wav_path = str(species_dir / "a.wav")
+    cache_path = tmp_path / "missing_dir" / ".meta_cache.parquet" # Can't be written
+
+    columns = _collect_metadata([(wav_path, 'bird1')], workers=1, cache_path=cache_path)
+
+    assert columns['duration'][0] == pytest.approx(1.0) # Results still returned
+    assert "Could not write metadata cache" in capsys.readouterr().out
+
+def test_collect_metadata_failure_cancels_pending(mocker):
+    # Threads instead of processes so the mocked worker function is shared
+    mocker.patch('data_inventory.ProcessPoolExecutor', ThreadPoolExecutor)
+    mocker.patch('data_inventory.METADATA_BATCH_SIZE', 1)
+    def read_batch(indices, paths, prefetch_headers):
+        if indices[0] == 0:
+            raise RuntimeError("decoder crashed")
+        time.sleep(0.05) # Still running when the failure is seen
+        return [(i, 1.0, 8000, 0, None) for i in indices]
+    mock_read = mocker.patch('data_inventory._read_metadata_batch', side_effect=read_batch)
+    walked = []
+    def entries():
+        for i in range(100):
+            walked.append(i)
+            yield f"bird1/{i}.wav", 'bird1'
+
+    with pytest.raises(RuntimeError, match="decoder crashed"):
+        _collect_metadata(entries(), workers=1)
+
+    # The walk stops a few batches past the failure, and of the queued batches
+    # at most the one already running is finished
+    assert len(walked) == data_inventory.MAX_PENDING_BATCHES_PER_WORKER + 1
+    assert mock_read.call_count <= 2
+
+def test_collect_metadata_streams_parquet(tmp_path, species_dir, mocker):
+    wav_paths = [str(species_dir / f"{i}.wav") for i in range(3)]
+    for i, wav_path in enumerate(wav_paths):
+        sf.write(wav_path, np.zeros(8000 * (i + 1)), 8000)
+    broken_path = str(species_dir / "broken.ogg")
+    with open(broken_path, 'wb') as f:
+        f.write(b'OggS') # Unreadable: no duration or sampling rate
+    output_path = tmp_path / "metadata_inventory.parquet"
+    mocker.patch('data_inventory.OUTPUT_ROW_GROUP_SIZE', 2)
+
+    _collect_metadata([(p, 'bird1') for p in wav_paths + [broken_path]], workers=1, output_path=output_path)
+
+    parquet_file = pq.ParquetFile(output_path)
+    assert parquet_file.metadata.num_row_groups == 2 # Rows written in chunks of 2
+    table = parquet_file.read()
+    assert table.column('duration').null_count == 1 # Missing values are nulls, not NaN
+    assert table.column('sampling_rate').null_count == 1
+    saved = table.to_pandas()
+    assert saved['file_path'].tolist() == wav_paths + [broken_path] # File order is kept
+    assert saved['duration'][:3].tolist() == pytest.approx([1.0, 2.0, 3.0])
+    assert (saved['sampling_rate'][:3] == 8000).all()
+    assert (saved['primary_label'] == 'bird1').all()
+
+def test_prefetch_headers(tmp_path, mocker):
+    small_path = str(tmp_path / "small.wav")
+    large_path = str(tmp_path / "large.wav")
+    sf.write(small_path, np.zeros(8000), 8000) # 16 kB, below HEADER_PREFETCH_BYTES
+    sf.write(large_path, np.zeros(80000), 8000) # 160 kB
+    large_size = os.path.getsize(large_path)
+    n = data_inventory.HEADER_PREFETCH_BYTES
+    calls = []
+    mocker.patch('os.posix_fadvise', create=True,
+                 side_effect=lambda fd, offset, length, advice: calls.append((os.fstat(fd).st_size, offset, length, advice)))
+
+    # The missing file is skipped; the small file only gets its head prefetched
+    _prefetch_headers([str(tmp_path / "missing.wav"), small_path, large_path])
+
+    willneed = os.POSIX_FADV_WILLNEED
+    assert calls == [
+        (os.path.getsize(small_path), 0, n, willneed),
+        (large_size, 0, n, willneed),
+        (large_size, large_size - n, n, willneed),
+    ]
+
+def test_read_metadata_batch_index_order(tmp_path, mocker):
+    wav_paths = [str(tmp_path / f"{i}.wav") for i in range(3)]
+    for i, wav_path in enumerate(wav_paths):
+        sf.write(wav_path, np.zeros(8000 * (i + 1)), 8000)
+    missing_path = str(tmp_path / "missing.wav")
+    mock_prefetch = mocker.patch('data_inventory._prefetch_headers')
+
+    records = _read_metadata_batch([7, 3, 9, 5], wav_paths + [missing_path])
+    mock_prefetch.assert_not_called() # Off by default
+
+    assert [r[0] for r in records] == [7, 3, 9, 5] # Same order as the indices passed in
+    assert [float(r[1]) for r in records[:3]] == pytest.approx([1.0, 2.0, 3.0])
+    assert all(r[2] == 8000 for r in records[:3])
+    assert np.isnan(records[3][1]) and records[3][2] == -1 # Missing file: no metadata
+    assert records[3][4] is not None
+
+    _read_metadata_batch([7, 3, 9, 5], wav_paths + [missing_path], prefetch_headers=True)
+    mock_prefetch.assert_called_once_with(wav_paths + [missing_path])
+
 # ---- Test Task 0.2.4: Create metadata DataFrame ----
 def test_create_metadata_dataframe(temp_data_dir):
     # Sample metadata list (as if generated by extract_file_metadata)
@@ -172,6 +378,33 @@ def test_create_metadata_dataframe(temp_data_dir):
     assert metadata_df.loc[1, 'sampling_rate'] == 44100
     assert pd.isna(metadata_df.loc[2, 'duration'])
     assert metadata_df.loc[2, 'error'] == 'Load Error'
+    for col in ('primary_label', 'format', 'class_name'):
+        assert isinstance(metadata_df[col].dtype, pd.CategoricalDtype)
+
+def test_create_metadata_dataframe_indexed_taxonomy(temp_data_dir):
+    # The pre-indexed taxonomy used by perform_data_inventory gives the same result
+    metadata_list = [
+        {'file_path': 'path/bird1/f1.ogg', 'duration': 10.0, 'sampling_rate': 32000, 'format': '.ogg', 'error': None},
+        {'file_path': 'path/unknown/f2.ogg', 'duration': 5.5, 'sampling_rate': 44100, 'format': '.ogg', 'error': None},
+    ]
+    taxonomy_df = pd.read_csv(temp_data_dir / "taxonomy.csv")
+
+    metadata_df = create_metadata_dataframe(metadata_list, _index_taxonomy(taxonomy_df))
+
+    assert metadata_df.loc[0, 'class_name'] == 'Aves'
+    assert pd.isna(metadata_df.loc[1, 'class_name']) # Species not in taxonomy
+
+def test_create_metadata_dataframe_bare_filenames(temp_data_dir):
+    # Paths without a directory get an empty label (as Path(x).parent.name did)
+    metadata_list = [
+        {'file_path': 'f.ogg', 'duration': 1.0, 'sampling_rate': 32000, 'format': '.ogg', 'error': None},
+    ]
+    taxonomy_df = pd.read_csv(temp_data_dir / "taxonomy.csv")
+
+    metadata_df = create_metadata_dataframe(metadata_list, taxonomy_df)
+
+    assert metadata_df.loc[0, 'primary_label'] == ''
+    assert pd.isna(metadata_df.loc[0, 'class_name'])
 
 # ---- Test Task 0.2.5: Generate summary statistics ----
 def test_generate_summary_statistics(temp_data_dir):
@@ -211,6 +444,84 @@ def test_generate_summary_statistics(temp_data_dir):
     assert summary['files_per_species']['bird1'] == 2
     assert summary['files_per_group']['Aves'] == 3
     assert summary['duration_stats']['mean'] == pytest.approx(11.1) # Mean of non-NaN durations
+    assert summary['duration_stats']['median'] == pytest.approx(10.0)
+    assert summary['duration_stats']['std'] == pytest.approx(metadata_df['duration'].std())
+    assert summary['duration_stats']['total_hours'] == pytest.approx(55.5 / 3600)
     assert summary['sampling_rate_stats'][32000] == 3
     assert summary['format_counts']['.ogg'] == 4
     assert summary['error_count'] == 1
+
+# ---- Test partial inventory (stages) ----
+def test_perform_data_inventory_counts_only(temp_data_dir, mocker):
+    # Metadata extraction must not run when only counts are requested
+    mocker.patch('data_inventory._collect_metadata', side_effect=AssertionError("Metadata should not be extracted"))
+
+    results = perform_data_inventory(temp_data_dir, stages=('count',))
+
+    assert len(results['audio_files']) == 5
+    assert results['species_counts'] == {'bird1': 2, 'bird2': 1, 'frog1': 1, 'insect1': 1}
+    assert results['group_counts'] == {'Aves': 3, 'Amphibia': 1, 'Insecta': 1}
+    assert 'metadata_df' not in results
+    assert 'summary_stats' not in results
+
+def test_perform_data_inventory_summary_needs_metadata(temp_data_dir):
+    with pytest.raises(ValueError):
+        perform_data_inventory(temp_data_dir, stages=('summary',))
+
+def test_perform_data_inventory_list_only(temp_data_dir):
+    # Listing always runs; it is not a selectable stage
+    results = perform_data_inventory(temp_data_dir, stages=())
+    assert set(results) == {'audio_files'}
+    assert len(results['audio_files']) == 5
+
+    with pytest.raises(ValueError):
+        perform_data_inventory(temp_data_dir, stages=('list',))
+
+def test_perform_data_inventory_full_pipeline(tmp_path):
+    # End to end on real wavs: walk -> pool -> columns -> taxonomy join -> summary
+    data_dir = tmp_path / "data"
+    train_audio = data_dir / "train_audio"
+    train_audio.mkdir(parents=True)
+    pd.DataFrame({
+        'primary_label': ['bird1', 'bird2', 'frog1'],
+        'class_name': ['Aves', 'Aves', 'Amphibia'],
+    }).to_csv(data_dir / "taxonomy.csv", index=False)
+    files = {
+        ('bird1', 'a.wav'): (1, 32000),
+        ('bird1', 'b.wav'): (2, 32000),
+        ('bird2', 'c.wav'): (3, 44100),
+        ('frog1', 'd.wav'): (4, 32000),
+        ('unknown1', 'e.wav'): (5, 48000), # Species not in taxonomy
+    }
+    durations_by_path = {}
+    for (species, name), (duration, sr) in files.items():
+        (train_audio / species).mkdir(parents=True, exist_ok=True)
+        path = str(train_audio / species / name)
+        sf.write(path, np.zeros(duration * sr), sr)
+        durations_by_path[path] = duration
+
+    output_path = tmp_path / "out" / "metadata.parquet"
+    output_path.parent.mkdir()
+    results = perform_data_inventory(data_dir, workers=2, output_path=output_path)
+    metadata_df = results['metadata_df']
+    summary = results['summary_stats']
+
+    # Rows line up with the walk order and with each file's own metadata
+    assert metadata_df['file_path'].tolist() == results['audio_files']
+    assert sorted(results['audio_files']) == sorted(durations_by_path)
+    for path, duration in zip(metadata_df['file_path'], metadata_df['duration']):
+        assert duration == pytest.approx(durations_by_path[path])
+    assert metadata_df['primary_label'].tolist() == [os.path.basename(os.path.dirname(p)) for p in metadata_df['file_path']]
+
+    assert summary['total_files'] == 5
+    assert summary['total_species'] == 4
+    assert summary['total_taxonomic_groups'] == 2 # unknown1 has no class
+    assert summary['files_per_species'] == {'bird1': 2, 'bird2': 1, 'frog1': 1, 'unknown1': 1}
+    assert summary['files_per_group'] == {'Aves': 3, 'Amphibia': 1}
+    assert summary['sampling_rate_stats'] == {32000: 3, 44100: 1, 48000: 1}
+    assert summary['format_counts'] == {'.wav': 5}
+    assert summary['duration_stats']['mean'] == pytest.approx(3.0)
+    assert summary['error_count'] == 0
+    assert results['species_counts'] == summary['files_per_species']
+    assert pq.read_table(output_path).column('file_path').to_pylist() == results['audio_files']
+    assert not (data_dir / "metadata_inventory.parquet").exists() # Nothing written into the dataset